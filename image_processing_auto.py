@@ -0,0 +1,659 @@
+#!/usr/bin/env python3
+# image_processing_auto.py
+from PIL import Image
+from PIL import ImageFilter
+from PIL import ImageStat
+from PIL import __version__ as pil_version
+from concurrent.futures import ThreadPoolExecutor
+from math import e
+from time import perf_counter
+import image_processing
+import json
+import os
+import platform
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import matplotlib
+    from matplotlib.colors import rgb_to_hsv
+    from matplotlib.colors import hsv_to_rgb
+except ImportError:
+    matplotlib = None
+
+__author__ = 'Seth Tinglof'
+__version__ = '1.0'
+
+PROFILE_PATH = "backend_profile.json"
+PROFILE_VERSION = 1
+
+# Size classes are chosen by pixel count.  Each class is benchmarked on a sample image of the listed size.
+SIZE_CLASSES = (
+    ('small', 640 * 480, (320, 240)),
+    ('medium', 1920 * 1080, (1280, 720)),
+    ('large', None, (2560, 1440)),
+)
+
+# Candidates that loop over pixels in Python are timed on a small sample and scaled up by pixel count, since timing
+# them on a full sample image would take several seconds per operation.
+EXTRAPOLATION_SIZE = (64, 64)
+BENCHMARK_REPEATS = 3
+BENCHMARK_ARGS = {
+    'modify_saturation': (1.5,),
+    'color_filter': ('blue',),
+    'resize': (0.5,),
+}
+
+COLOR_HUES = {
+    'red': 0,
+    'orange': 1 / 12,
+    'yellow': 1 / 6,
+    'green': 1 / 3,
+    'cyan': 1 / 2,
+    'blue': 2 / 3,
+    'violet': 3 / 4,
+    'magenta': 5 / 6,
+}
+
+_executor = None
+
+
+class Candidate:
+
+    def __init__(self, name, function, extrapolate=False, fallback=False):
+        """
+        A single implementation of an image processing operation.
+        :param name: Name the candidate is recorded under in the profile file.
+        :param function: Function that takes an image followed by the operation's arguments and returns a new image.
+        :param extrapolate: If True, the candidate is timed on a small sample and scaled up by pixel count.
+        :param fallback: If True, the candidate is not timed against the others because its output differs from
+        theirs.  It is only used when every other candidate is unavailable or fails.
+        """
+        self.name = name
+        self.function = function
+        self.extrapolate = extrapolate
+        self.fallback = fallback
+
+
+def method_candidate(processor_class, method_name, *fixed_args):
+    """
+    Wraps a method of an ImageProcessor class as a candidate function.  The input image is never modified.
+    :param processor_class: ImageProcessor class that implements the operation.
+    :param method_name: Name of the method that performs the operation.
+    :param fixed_args: Arguments passed to the method before the operation's own arguments.
+    :return: Function that takes an image and the operation's arguments and returns the processed image.
+    """
+    def candidate(image, *args):
+        processor = processor_class(image.copy())
+        getattr(processor, method_name)(*fixed_args, *args)
+        return processor.image
+    return candidate
+
+
+def tiled(function):
+    """
+    Wraps a per-pixel candidate function so that it runs on horizontal strips of the image in a thread pool.  Only
+    operations where each output pixel depends on the matching input pixel alone may be tiled.
+    :param function: Candidate function to run on each strip.
+    :return: Candidate function that processes the image strip by strip.
+    """
+    def candidate(image, *args):
+        width, height = image.size
+        count = min(thread_count(), height)
+        boxes = [(0, height * i // count, width, height * (i + 1) // count) for i in range(count)]
+        tiles = list(get_executor().map(lambda box: function(image.crop(box), *args), boxes))
+        result = Image.new(tiles[0].mode, image.size)
+        for box, tile in zip(boxes, tiles):
+            result.paste(tile, box[:2])
+        return result
+    return candidate
+
+
+def thread_count():
+    return os.cpu_count() or 1
+
+
+def get_executor():
+    """
+    Returns the thread pool shared by all tiled candidates, creating it on first use.
+    :return: ThreadPoolExecutor
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(thread_count())
+    return _executor
+
+
+def pil_grayscale(image):
+    """
+    Converts an image to grayscale.
+    :param image: RGB image.
+    :return: Grayscale image in RGB mode.
+    """
+    return image.convert("L").convert("RGB")
+
+
+def pil_black_and_white(image):
+    """
+    Converts an image to a dithered black and white image.
+    :param image: RGB image.
+    :return: Black and white image in RGB mode.
+    """
+    return image.convert("1").convert("RGB")
+
+
+def pil_invert(image):
+    """
+    Inverts the colors of an image.
+    :param image: Image to invert.
+    :return: Inverted image.
+    """
+    return Image.eval(image, lambda x: 255 - x)
+
+
+def pil_average(image):
+    """
+    Creates an image of the same size filled with the average color of the input image.
+    :param image: RGB image.
+    :return: Image with every pixel set to the average color.
+    """
+    pixels = image.size[0] * image.size[1]
+    color = tuple(int(total) // pixels for total in ImageStat.Stat(image).sum)
+    return Image.new("RGB", image.size, color)
+
+
+def pil_sepia(image):
+    """
+    Gives an RGB image the appearance of a sepia tone.
+    :param image: RGB image.
+    :return: Sepia toned image.
+    """
+    sepia_matrix = (
+        0.393, 0.769, 0.189, 0,
+        0.349, 0.686, 0.168, 0,
+        0.272, 0.534, 0.131, 0)
+    return image.convert("RGB", sepia_matrix)
+
+
+def pil_resize(image, scale):
+    """
+    Resizes an image to be its original width and height multiplied by a scaling factor.
+    :param image: Image to resize.
+    :param scale: The value that the height and width are multiplied by.
+    :return: Resized image.
+    """
+    return image.resize((int(image.size[0] * scale), int(image.size[1] * scale)), Image.LANCZOS)
+
+
+def pil_edge_detection(image):
+    """
+    Traces the edges of an image.
+    :param image: Image to trace.
+    :return: Image of the edges.
+    """
+    return image.filter(ImageFilter.FIND_EDGES)
+
+
+def numpy_grayscale(image):
+    """
+    Converts an RGB image to grayscale using the same weights as image_processing.
+    :param image: RGB image.
+    :return: Grayscale image in RGB mode.
+    """
+    array = numpy.asarray(image, dtype='float32')
+    gray = (array @ numpy.array([.2989, .5870, .1140], dtype='float32')).astype('uint8')
+    return Image.fromarray(gray, "L").convert("RGB")
+
+
+def numpy_invert(image):
+    """
+    Inverts the colors of an image.
+    :param image: Image to invert.
+    :return: Inverted image.
+    """
+    return Image.fromarray(255 - numpy.asarray(image), image.mode)
+
+
+def numpy_average(image):
+    """
+    Creates an image of the same size filled with the average color of the input image.
+    :param image: RGB image.
+    :return: Image with every pixel set to the average color.
+    """
+    sums = numpy.asarray(image).reshape(-1, 3).sum(axis=0, dtype='uint64')
+    color = tuple(int(total) // (image.size[0] * image.size[1]) for total in sums)
+    return Image.new("RGB", image.size, color)
+
+
+def numpy_sepia(image):
+    """
+    Gives an RGB image the appearance of a sepia tone.
+    :param image: RGB image.
+    :return: Sepia toned image.
+    """
+    sepia_matrix = numpy.array([
+        [0.393, 0.769, 0.189],
+        [0.349, 0.686, 0.168],
+        [0.272, 0.534, 0.131]], dtype='float32')
+    array = numpy.asarray(image, dtype='float32') @ sepia_matrix.T
+    return Image.fromarray(numpy.minimum(array, 255).astype('uint8'), "RGB")
+
+
+def numpy_saturation(image, amount):
+    """
+    Modifies the saturation of an RGB image the same way as image_processing_optimized.
+    :param image: RGB image.
+    :param amount: Scalar that saturation values will be modified by. Should be from 0 to 2
+    :return: Image with modified saturation.
+    """
+    hsv = rgb_to_hsv(numpy.asarray(image) / 255)
+    hsv[..., 1] **= e ** (1 - amount)
+    return Image.fromarray((hsv_to_rgb(hsv) * 255).astype('uint8'), "RGB")
+
+
+def numpy_color_filter(image, color):
+    """
+    Sets the hue of every pixel in an RGB image to the hue of a color.
+    :param image: RGB image.
+    :param color: Name of the color.  Unsupported colors are treated as red.
+    :return: Image with the new hue.
+    """
+    hsv = rgb_to_hsv(numpy.asarray(image) / 255)
+    hsv[..., 0] = COLOR_HUES.get(color.lower(), 0)
+    return Image.fromarray((hsv_to_rgb(hsv) * 255).astype('uint8'), "RGB")
+
+
+def build_candidates():
+    """
+    Lists every implementation of each operation whose dependencies are installed.
+    :return: Dictionary mapping operation names to lists of Candidate objects.
+    """
+    python = image_processing.ImageProcessor
+    candidates = {
+        'convert_to_grayscale': [
+            Candidate('python', method_candidate(python, 'convert_to_grayscale'), True),
+            Candidate('pil', pil_grayscale),
+            Candidate('tiled', tiled(pil_grayscale)),
+        ],
+        # image_processing only thresholds, while PIL dithers, so its black and white conversion is a fallback.
+        'convert_to_black_and_white': [
+            Candidate('python', method_candidate(python, 'convert_to_black_and_white', 128), True, True),
+            Candidate('pil', pil_black_and_white),
+        ],
+        # image_processing scales saturation linearly rather than by a power, so it is also a fallback.
+        'modify_saturation': [Candidate('python', method_candidate(python, 'modify_saturation'), True, True)],
+        'color_filter': [Candidate('python', method_candidate(python, 'color_filter'), True)],
+        'invert_colors': [Candidate('pil', pil_invert), Candidate('tiled', tiled(pil_invert))],
+        'average_pixel_color': [
+            Candidate('python', method_candidate(python, 'average_pixel_color'), True),
+            Candidate('pil', pil_average),
+        ],
+        'sepia_tone': [
+            Candidate('python', method_candidate(python, 'sepia_tone'), True),
+            Candidate('pil', pil_sepia),
+            Candidate('tiled', tiled(pil_sepia)),
+        ],
+        'resize': [Candidate('pil', pil_resize)],
+        'edge_detection': [Candidate('pil', pil_edge_detection)],
+    }
+
+    if numpy is not None:
+        candidates['convert_to_grayscale'].append(Candidate('numpy', numpy_grayscale))
+        candidates['invert_colors'].append(Candidate('numpy', numpy_invert))
+        candidates['average_pixel_color'].append(Candidate('numpy', numpy_average))
+        candidates['sepia_tone'].append(Candidate('numpy', numpy_sepia))
+
+    if numpy is not None and matplotlib is not None:
+        candidates['modify_saturation'] += [
+            Candidate('numpy', numpy_saturation),
+            Candidate('tiled', tiled(numpy_saturation)),
+        ]
+        candidates['color_filter'] += [
+            Candidate('numpy', numpy_color_filter),
+            Candidate('tiled', tiled(numpy_color_filter)),
+        ]
+    return candidates
+
+
+def size_class(size):
+    """
+    Finds the size class an image belongs to.
+    :param size: Width and height of the image.
+    :return: Name of the size class.
+    """
+    pixels = size[0] * size[1]
+    for name, limit, _ in SIZE_CLASSES:
+        if limit is None or pixels <= limit:
+            return name
+
+
+def host_description():
+    """
+    Describes the host so that a profile recorded on a different machine or library version is not reused.
+    :return: Dictionary describing the host.
+    """
+    return {
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': thread_count(),
+        'python': platform.python_version(),
+        'pillow': pil_version,
+        'numpy': numpy.__version__ if numpy is not None else None,
+        'matplotlib': matplotlib.__version__ if matplotlib is not None else None,
+    }
+
+
+def is_table(value):
+    """
+    Checks that a value read from the profile file maps size classes to dictionaries.
+    :param value: Value to check.
+    :return: True if value is a dictionary of dictionaries.
+    """
+    return isinstance(value, dict) and all(isinstance(entry, dict) for entry in value.values())
+
+
+class BackendSelector:
+
+    def __init__(self, profile_path=PROFILE_PATH):
+        """
+        Picks the fastest implementation of each operation for each image size class.  Operations are benchmarked
+        the first time they are used on an image of a given size class and the results are saved to a profile file
+        that is reused on later runs.
+        :param profile_path: Path of the profile file, or None to keep results in memory only.
+        """
+        self.profile_path = profile_path
+        self.candidates = build_candidates()
+        self.choices = {}
+        self.timings = {}
+        self.failures = {}
+        self.loaded_choices = set()
+        self.load_profile()
+
+    def load_profile(self):
+        """
+        Loads previous benchmark results.  Results are ignored if the file is missing, malformed, or was recorded on
+        a different host.
+        :return: None
+        """
+        if self.profile_path is None:
+            return
+        try:
+            with open(self.profile_path) as file:
+                profile = json.load(file)
+        except (OSError, ValueError):
+            return
+        if not isinstance(profile, dict):
+            return
+        if profile.get('version') != PROFILE_VERSION or profile.get('host') != host_description():
+            return
+        choices = profile.get('choices', {})
+        timings = profile.get('timings', {})
+        failures = profile.get('failed', {})
+        if is_table(choices) and is_table(timings) and is_table(failures):
+            self.choices = choices
+            self.timings = timings
+            self.failures = failures
+            self.loaded_choices = {(class_name, operation)
+                                   for class_name, operations in choices.items() for operation in operations}
+
+    def is_loaded_choice(self, operation, size):
+        """
+        Checks whether the choice for an operation was read from the profile file rather than benchmarked during
+        this run.
+        :param operation: Name of the ImageProcessor method.
+        :param size: Width and height of the image.
+        :return: True if the choice came from the profile file.
+        """
+        return (size_class(size), operation) in self.loaded_choices
+
+    def save_profile(self):
+        """
+        Saves benchmark results to the profile file.  Failure to write the file is not an error, the operations are
+        simply benchmarked again on the next run.
+        :return: None
+        """
+        if self.profile_path is None:
+            return
+        profile = {
+            'version': PROFILE_VERSION,
+            'host': host_description(),
+            'choices': self.choices,
+            'timings': self.timings,
+            'failed': self.failures,
+        }
+        try:
+            with open(self.profile_path, 'w') as file:
+                json.dump(profile, file, indent=2, sort_keys=True)
+        except OSError:
+            pass
+
+    def choose(self, operation, size):
+        """
+        Returns the fastest implementation of an operation for images of the given size, benchmarking the candidates
+        if they have not been benchmarked for the image's size class yet.
+        :param operation: Name of the ImageProcessor method.
+        :param size: Width and height of the image.
+        :return: Candidate object.
+        """
+        options = self.candidates[operation]
+        name = self.choices.get(size_class(size), {}).get(operation)
+        for candidate in options:
+            if candidate.name == name:
+                return candidate
+        preferred = [candidate for candidate in options if not candidate.fallback] or options
+        if len(preferred) == 1:
+            return preferred[0]
+        return self.benchmark(operation, size_class(size))
+
+    def benchmark(self, operation, class_name):
+        """
+        Times every candidate of an operation on a sample image of the size class, records the fastest, and saves the
+        profile.  Candidates that raise an error are skipped and recorded in the profile under 'failed'.  Fallback
+        candidates are only timed if every other candidate is unavailable or raises an error.
+        :param operation: Name of the ImageProcessor method.
+        :param class_name: Name of the size class.
+        :return: The fastest Candidate object.
+        """
+        sample_size = next(size for name, _, size in SIZE_CLASSES if name == class_name)
+        sample = random_image(sample_size)
+        small_sample = sample.crop((0, 0) + EXTRAPOLATION_SIZE)
+        scale = sample_size[0] * sample_size[1] / (EXTRAPOLATION_SIZE[0] * EXTRAPOLATION_SIZE[1])
+        args = BENCHMARK_ARGS.get(operation, ())
+
+        results = {}
+        failures = {}
+        error = None
+        preferred = [candidate for candidate in self.candidates[operation] if not candidate.fallback]
+        fallbacks = [candidate for candidate in self.candidates[operation] if candidate.fallback]
+        for group in (preferred, fallbacks):
+            for candidate in group:
+                try:
+                    if candidate.extrapolate:
+                        results[candidate.name] = time_candidate(candidate, small_sample, args) * scale
+                    else:
+                        results[candidate.name] = time_candidate(candidate, sample, args)
+                except Exception as exception:
+                    # A candidate that fails with the installed library versions is never chosen.
+                    failures[candidate.name] = "%s: %s" % (type(exception).__name__, exception)
+                    error = exception
+            if results:
+                break
+        self.failures.setdefault(class_name, {})[operation] = failures
+        self.loaded_choices.discard((class_name, operation))
+        if not results:
+            self.save_profile()
+            raise error
+
+        fastest = min(results, key=results.get)
+        self.choices.setdefault(class_name, {})[operation] = fastest
+        self.timings.setdefault(class_name, {})[operation] = results
+        self.save_profile()
+        return next(candidate for candidate in self.candidates[operation] if candidate.name == fastest)
+
+    def tune(self):
+        """
+        Benchmarks every operation that has more than one candidate for every size class.
+        :return: None
+        """
+        for operation, options in self.candidates.items():
+            if len(options) > 1:
+                for class_name, _, _ in SIZE_CLASSES:
+                    self.benchmark(operation, class_name)
+
+
+def random_image(size):
+    """
+    Creates an RGB image filled with random noise to benchmark candidates on.
+    :param size: Width and height of the image.
+    :return: RGB image.
+    """
+    return Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3))
+
+
+def time_candidate(candidate, image, args):
+    """
+    Times a candidate on an image.
+    :param candidate: Candidate to time.
+    :param image: Image to run the candidate on.
+    :param args: Arguments passed to the candidate after the image.
+    :return: Fastest of several runs in seconds.
+    """
+    best = None
+    for _ in range(BENCHMARK_REPEATS):
+        start = perf_counter()
+        candidate.function(image, *args)
+        elapsed = perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+_selector = None
+
+
+def get_selector():
+    """
+    Returns the BackendSelector shared by all ImageProcessor objects, creating it on first use.
+    :return: BackendSelector
+    """
+    global _selector
+    if _selector is None:
+        _selector = BackendSelector()
+    return _selector
+
+
+class ImageProcessor:
+    WHITE = (255, 255, 255)
+    BLACK = (0, 0, 0)
+
+    def __init__(self, image, selector=None):
+        """
+        Image processor that runs each operation with whichever backend is fastest on this host for the image's size.
+        :param image: Image to process.  Images that are not RGB are converted to RGB.
+        :param selector: BackendSelector to use.  Defaults to one shared by all ImageProcessor objects.
+        """
+        # Candidates are only benchmarked on RGB images, so other modes are converted up front.
+        self.image = image if image.mode == "RGB" else image.convert("RGB")
+        self.IMAGE_BACKUP = self.image.copy()
+        self.selector = selector if selector is not None else get_selector()
+
+    def apply(self, operation, *args):
+        """
+        Runs an operation on the ImageProcessor's image object using the fastest candidate implementation.
+        :param operation: Name of the operation.
+        :param args: Arguments for the operation.
+        :return: None
+        """
+        candidate = self.selector.choose(operation, self.image.size)
+        try:
+            self.image = candidate.function(self.image, *args)
+        except Exception:
+            if not self.selector.is_loaded_choice(operation, self.image.size):
+                raise
+            # A saved choice can start failing after a library upgrade, so benchmark again and retry once.
+            candidate = self.selector.benchmark(operation, size_class(self.image.size))
+            self.image = candidate.function(self.image, *args)
+
+    def convert_to_grayscale(self):
+        """
+        Converts the ImageProcessor's image object to grayscale.
+        :return: None
+        """
+        self.apply('convert_to_grayscale')
+
+    def convert_to_black_and_white(self):
+        """
+        Converts ImageProcessor's image object to a black and white image.
+        :return: None
+        """
+        self.apply('convert_to_black_and_white')
+
+    def modify_saturation(self, amount):
+        """
+        Modifies saturation of the ImageProcessor's image object.
+        :param amount: Scalar that saturation values will be modified by. Should be from 0 to 2
+        :return: None
+        """
+        self.apply('modify_saturation', amount)
+
+    def color_filter(self, color):
+        """
+        Makes the ImageProcessor's image object appear the color that is passed as an argument.
+        :param color: color image is set to appear passed as a string. Supported colors are red, orange, green, blue,
+        yellow, cyan, magenta, and violet.
+        :return: None
+        """
+        self.apply('color_filter', color)
+
+    def invert_colors(self):
+        self.apply('invert_colors')
+
+    def average_pixel_color(self):
+        """
+        Changes every pixel in the ImageProcessor's image object to the average color of the initial image.
+        :return: None
+        """
+        self.apply('average_pixel_color')
+
+    def sepia_tone(self):
+        """
+        Gives the ImageProcessor's image the appearance of a sepia tone.
+        :return: None
+        """
+        self.apply('sepia_tone')
+
+    def resize(self, scale):
+        """
+        Resize image to be its original width and height multiplied by a scaling factor.
+        :param scale: The value that the height and width are multiplied by.
+        :return: None
+        """
+        self.apply('resize', scale)
+
+    def edge_detection(self):
+        self.apply('edge_detection')
+
+    def reset_image(self):
+        """
+        Sets the ImageProcessing image back to the default, i.e., the image which the ImageProcessing object was
+        instantiated with
+        :return: None
+        """
+        self.image = self.IMAGE_BACKUP.copy()
+
+    def fit_to_screen(self, screen_width=1280, screen_height=720):
+        """
+        Re-sizes the image to fit on the screen.  Also changes the backup of the original image to this resized image.
+        :param screen_width: Maximum width that the image can take up.
+        :param screen_height: Maximum height that the image can take up.
+        :return: None
+        """
+        if self.image.size[0] > screen_width or self.image.size[1] > screen_height:
+            if self.image.size[0] / screen_width > self.image.size[1] / screen_height:
+                self.resize(screen_width / self.image.size[0])
+            else:
+                self.resize(screen_height / self.image.size[1])
+            self.IMAGE_BACKUP = self.image.copy()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# test_image_processing_auto.py
+import json
+import pytest
+from PIL import Image
+from PIL import ImageChops
+import image_processing_auto
+from image_processing_auto import BackendSelector, Candidate, ImageProcessor, build_candidates, random_image
+from image_processing_auto import size_class
+
+__author__ = 'Seth Tinglof'
+__version__ = '1.0'
+
+
+def failing(image, *args):
+    raise ValueError("candidate failed")
+
+
+def solid(color):
+    return lambda image, *args: Image.new("RGB", image.size, color)
+
+
+def test_size_class_boundaries():
+    assert size_class((640, 480)) == 'small'
+    assert size_class((641, 480)) == 'medium'
+    assert size_class((1920, 1080)) == 'medium'
+    assert size_class((1921, 1080)) == 'large'
+
+
+def test_fallback_chosen_when_preferred_candidates_fail(tmp_path):
+    selector = BackendSelector(profile_path=tmp_path / "profile.json")
+    selector.candidates['sepia_tone'] = [
+        Candidate('numpy', failing),
+        Candidate('tiled', failing),
+        Candidate('python', solid((1, 2, 3)), fallback=True),
+    ]
+    processor = ImageProcessor(random_image((16, 16)), selector)
+    processor.sepia_tone()
+    assert processor.image.getpixel((0, 0)) == (1, 2, 3)
+    assert selector.choices['small']['sepia_tone'] == 'python'
+
+
+def test_fallback_not_timed_against_working_candidates(tmp_path):
+    selector = BackendSelector(profile_path=tmp_path / "profile.json")
+    selector.candidates['sepia_tone'] = [
+        Candidate('numpy', solid((1, 2, 3))),
+        Candidate('tiled', failing),
+        Candidate('python', solid((4, 5, 6)), fallback=True),
+    ]
+    assert selector.benchmark('sepia_tone', 'small').name == 'numpy'
+    assert set(selector.timings['small']['sepia_tone']) == {'numpy'}
+
+
+def test_failing_saved_choice_is_benchmarked_again(tmp_path):
+    path = tmp_path / "profile.json"
+    saved = BackendSelector(profile_path=path)
+    saved.choices = {'small': {'sepia_tone': 'numpy'}}
+    saved.save_profile()
+
+    selector = BackendSelector(profile_path=path)
+    selector.candidates['sepia_tone'] = [
+        Candidate('numpy', failing),
+        Candidate('pil', solid((1, 2, 3))),
+    ]
+    processor = ImageProcessor(random_image((16, 16)), selector)
+    processor.sepia_tone()
+    assert processor.image.getpixel((0, 0)) == (1, 2, 3)
+    assert selector.choices['small']['sepia_tone'] == 'pil'
+
+
+def test_failing_benchmarked_choice_is_not_benchmarked_again(tmp_path):
+    selector = BackendSelector(profile_path=tmp_path / "profile.json")
+    selector.candidates['sepia_tone'] = [
+        Candidate('numpy', lambda image: image.copy()),
+        Candidate('pil', failing),
+    ]
+    processor = ImageProcessor(random_image((16, 16)), selector)
+    processor.sepia_tone()
+    timings = selector.timings['small']['sepia_tone']
+    with pytest.raises(TypeError):
+        processor.apply('sepia_tone', 'unexpected argument')
+    assert selector.timings['small']['sepia_tone'] is timings
+
+
+def test_failed_candidates_recorded(tmp_path):
+    path = tmp_path / "profile.json"
+    selector = BackendSelector(profile_path=path)
+    selector.candidates['sepia_tone'] = [Candidate('numpy', solid((1, 2, 3))), Candidate('pil', failing)]
+    selector.benchmark('sepia_tone', 'small')
+    profile = json.loads(path.read_text())
+    assert profile['failed']['small']['sepia_tone'] == {'pil': "ValueError: candidate failed"}
+    assert BackendSelector(profile_path=path).failures == profile['failed']
+
+
+def test_shipped_candidates_match_reference(monkeypatch):
+    # Each operation is compared to its first non-fallback candidate, which is the pure Python implementation
+    # wherever that produces the same output.  Tiled candidates are split into several strips even on one core.
+    monkeypatch.setattr(image_processing_auto, 'thread_count', lambda: 4)
+    image = random_image((48, 32))
+    for operation, options in build_candidates().items():
+        args = image_processing_auto.BENCHMARK_ARGS.get(operation, ())
+        preferred = [candidate for candidate in options if not candidate.fallback] or options
+        reference = preferred[0].function(image, *args)
+        for candidate in preferred[1:]:
+            output = candidate.function(image, *args)
+            assert (output.mode, output.size) == (reference.mode, reference.size), (operation, candidate.name)
+            extrema = ImageChops.difference(output, reference).getextrema()
+            assert max(high for _, high in extrema) <= 1, (operation, candidate.name)
+
+
+def test_fit_to_screen():
+    processor = ImageProcessor(random_image((400, 200)), BackendSelector(profile_path=None))
+    processor.fit_to_screen(200, 200)
+    assert processor.image.size == (200, 100)
+
+
+def test_profile_round_trip(tmp_path):
+    path = tmp_path / "profile.json"
+    selector = BackendSelector(profile_path=path)
+    selector.candidates['sepia_tone'] = [Candidate('numpy', solid((1, 2, 3))), Candidate('pil', failing)]
+    selector.benchmark('sepia_tone', 'small')
+    assert BackendSelector(profile_path=path).choices == {'small': {'sepia_tone': 'numpy'}}
+
+
+def test_profile_from_different_host_ignored(tmp_path):
+    path = tmp_path / "profile.json"
+    selector = BackendSelector(profile_path=path)
+    selector.choices = {'small': {'sepia_tone': 'numpy'}}
+    selector.save_profile()
+    profile = json.loads(path.read_text())
+    profile['host']['cpu_count'] += 1
+    path.write_text(json.dumps(profile))
+    assert BackendSelector(profile_path=path).choices == {}
+
+
+def test_malformed_profile_ignored(tmp_path):
+    path = tmp_path / "profile.json"
+    valid = {
+        'version': image_processing_auto.PROFILE_VERSION,
+        'host': image_processing_auto.host_description(),
+        'choices': {'medium': 'x'},
+    }
+    for contents in ('null', '[]', '{not json', json.dumps(valid)):
+        path.write_text(contents)
+        selector = BackendSelector(profile_path=path)
+        assert selector.choices == {}
+        selector.choose('sepia_tone', (16, 16))
+
+
+def test_non_rgb_images_converted():
+    for mode in ("RGBA", "L", "P"):
+        processor = ImageProcessor(Image.new(mode, (16, 16)), BackendSelector(profile_path=None))
+        assert processor.image.mode == "RGB"
+        processor.average_pixel_color()
+        assert processor.image.mode == "RGB"
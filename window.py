@@ -12,7 +12,7 @@ from tkinter import Entry
 from tkinter import OptionMenu, StringVar
 from tkinter import Scale
 from PIL import Image, ImageTk
-from image_processing_optimized import ImageProcessor
+from image_processing_auto import ImageProcessor
 
 __author__ = 'Seth Tinglof'
 __version__ = '1.0'